@@ -6,6 +6,7 @@ import stat
 import re
 import subprocess
 import sys
+import time
 
 from .db import DBManager
 from .executor import Executor
@@ -17,6 +18,12 @@ except ImportError as ex:
     classad = htcondor = None
     CONDOR_IMPORT_ERROR = ex
 
+# Cluster id in the process range printed by condor_submit -terse
+_CLUSTER_RE = re.compile(r'(\d+)\.\d+ - \d+\.\d+')
+
+# Name of the submitting machine, recorded as the job's scheduler
+_HOSTNAME = os.uname()[1]
+
 
 class Condor(Executor):
 
@@ -31,18 +38,30 @@ class Condor(Executor):
     sub_exec = 'sequential'
     log_job = False
     log_all = False
+    wait = False
+    wait_timeout = 40   # minutes, 0 for no timeout
+    wait_complete = True
     other_args = None
     arg_parser = None
 
+    # Log file names for the job being submitted, see set_log_files
+    log_job_file = None
+    log_out_file = None
+    log_err_file = None
+
     __dbmanager__ = None
 
     def __init__(self, condor_req=machine_reqs, condor_exec=sub_exec,
-                 condor_log=log_job, condor_log_all=log_all, arg_parser=None, **argv):
+                 condor_log=log_job, condor_log_all=log_all, condor_wait=wait,
+                 condor_wait_timeout=wait_timeout, arg_parser=None, **argv):
         super(Condor, self).__init__(**argv)
         self.machine_reqs = condor_req
         self.sub_exec = condor_exec
-        self.log_job = condor_log
+        # Waiting follows the job log, so requires one
+        self.log_job = condor_log or condor_wait
         self.log_all = condor_log_all
+        self.wait = condor_wait
+        self.wait_timeout = condor_wait_timeout
         self.arg_parser = arg_parser
 
         # Cache all other passed args for the argument string the executed job
@@ -58,68 +77,165 @@ class Condor(Executor):
             raise ValueError("Cannot submit Condor job without database")
 
         # Submit job to Condor?
-        jobstr = self.build_job(job)
+        submit = self.build_submit_dict(job)
+        n = len(job.batches)
 
         print("Submitting to Condor Scheduler")
 
-        if False:
-            self.write_cmd(jobstr)
-            job.condor_scheduler = "condor.cmd file"
-        else:
-            job.condor_cluster = self.submit_job(jobstr)
-            job.condor_scheduler = os.uname()[1]
-
-        print("Submitted %s batches as cluster %s on %s. Test job id: %s" %
-              (len(job.batches), job.condor_cluster, job.condor_scheduler, job._dbid))
+        try:
+            if False:
+                self.write_cmd(self.render_submit(submit, n))
+                job.condor_scheduler = "condor.cmd file"
+            else:
+                job.condor_cluster = self.submit_job(submit, n)
+                job.condor_scheduler = _HOSTNAME
 
-        self.write_jobinfo(job)
+            print("Submitted %s batches as cluster %s on %s. Test job id: %s" %
+                  (len(job.batches), job.condor_cluster, job.condor_scheduler,
+                   job._dbid))
 
-        if self.__dbmanager__:
+            self.write_jobinfo(job)
             self.__dbmanager__.update_object(job)
+        finally:
+            # Always hand the connection back, even if submission failed
             self.__dbmanager__.disconnect()
-        exit(0)
-
-    def build_job(self, job):
-        # Batch and testcase information :: What to run
-        n = len(job.batches)
 
+        if self.wait:
+            print("Waiting for cluster %s to complete" % job.condor_cluster)
+            self.wait_complete = self.wait_for_cluster(
+                job.condor_cluster, n, self.get_job_log(job.condor_cluster))
+            if self.wait_complete:
+                print("Cluster %s completed" % job.condor_cluster)
+
+        return job.condor_cluster
+
+    def set_log_files(self, job):
+        """Interpolates the log file name templates for a job, once. Condor
+        expands the remaining $(Cluster) and $(Process) macros itself"""
+        self.log_job_file = self.LOG_JOB_FILE % job._dbid
+        self.log_out_file = self.LOG_OUT_FILE % job._dbid
+        self.log_err_file = self.LOG_ERR_FILE % job._dbid
+
+    def get_job_log(self, cluster):
+        """Path of the job's event log once submitted as the given cluster"""
+        return self.log_job_file.replace('$(Cluster)', str(cluster))
+
+    def build_submit_dict(self, job):
+        """Builds the submit description for a job, as a dict of submit
+        commands (excluding the queue statement)"""
+        self.set_log_files(job)
         c = {
             'universe': 'vanilla',
             'requirements': self.machine_reqs,
             'executable': sys.argv[0],
             'accounting_group': 'jscert',
             'getenv': 'True',    # Copy environment variables across
-            'arguments': '"%s"' % (self.build_arguments(job).replace('"', '""'))
+            'arguments': self.quote_arguments(self.build_arguments(job))
         }
 
         if self.log_all:
-            c['output'] = self.LOG_OUT_FILE % job._dbid
-            c['error'] = self.LOG_ERR_FILE % job._dbid
+            c['output'] = self.log_out_file
+            c['error'] = self.log_err_file
 
         if self.log_job:
-            c['log'] = self.LOG_JOB_FILE % job._dbid
+            c['log'] = self.log_job_file
 
-        jobstr = '\n'.join('%s = %s\n' % (k, v) for (k, v) in c.iteritems())
-        jobstr += '\nqueue %s' % n
+        return c
 
+    @staticmethod
+    def render_submit(submit, n):
+        """Serialises a submit description into the condor_submit file format,
+        queueing n processes"""
+        jobstr = '\n'.join('%s = %s\n' % (k, v) for (k, v) in submit.items())
+        jobstr += '\nqueue %s' % n
         return jobstr
 
     def write_cmd(self, jobstr):
         with open('condor.cmd', 'w') as f:
-            f.writelines(jobstr)
-
-    def submit_job(self, jobstr):
+            f.write(jobstr)
+
+    def submit_job(self, submit, n):
+        """Queues n processes of the submit description, returns the cluster id.
+        Talks to the schedd directly through the Python bindings if they are
+        available, otherwise falls back to calling condor_submit."""
+        if htcondor:
+            schedd = htcondor.Schedd()
+            with schedd.transaction() as txn:
+                cluster = htcondor.Submit(submit).queue(txn, count=n)
+            return str(cluster)
+
+        return self.submit_job_cmd(self.render_submit(submit, n))
+
+    def submit_job_cmd(self, jobstr):
+        # stderr is inherited as is, rather than dup'd from sys.stderr
         p = subprocess.Popen(['condor_submit', '-terse', '-'],
                              stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-                             stderr=sys.stderr)
-        (out, err) = p.communicate(jobstr)
-        match = re.search(r'(\d+)\.\d+ - \d+\.\d+', out)
+                             bufsize=-1, close_fds=True)
+        (out, err) = p.communicate(jobstr.encode('utf-8'))
+        match = _CLUSTER_RE.search(out.decode('utf-8'))
         if match:
             return match.group(1)
         return 0
 
+    def wait_for_cluster(self, cluster, n, logfile):
+        """Blocks until all n processes of the cluster have left the queue, by
+        following the job event log rather than polling the schedd. Returns
+        False if the wait timed out. Held processes count as not yet complete,
+        and anything unfinished is left in the queue"""
+        timeout = self.wait_timeout * 60
+
+        if not htcondor:
+            cmd = ['condor_wait']
+            if timeout:
+                cmd += ['-wait', str(int(timeout))]
+            if subprocess.call(cmd + [logfile, str(cluster)]) != 0:
+                logging.error("Gave up waiting for cluster %s, unfinished "
+                              "processes are left queued", cluster)
+                return False
+            return True
+
+        cluster = int(cluster)
+        done_events = (htcondor.JobEventType.JOB_TERMINATED,
+                       htcondor.JobEventType.JOB_ABORTED)
+        deadline = time.time() + timeout if timeout else None
+        remaining = n
+        jel = htcondor.JobEventLog(logfile)
+        try:
+            while remaining:
+                stop_after = None
+                if deadline is not None:
+                    stop_after = int(deadline - time.time())
+                    if stop_after <= 0:
+                        logging.error("Gave up waiting for cluster %s, %s "
+                                      "unfinished processes are left queued",
+                                      cluster, remaining)
+                        return False
+
+                # Returns once no new events arrive within stop_after seconds
+                for event in jel.events(stop_after=stop_after):
+                    if event.cluster != cluster:
+                        continue
+                    if event.type == htcondor.JobEventType.JOB_HELD:
+                        # Keep waiting, it may still be released
+                        logging.warning("Process %s.%s was held, see condor_q "
+                                        "-hold and condor_release",
+                                        cluster, event.proc)
+                    if event.type in done_events:
+                        remaining -= 1
+                        if not remaining:
+                            break
+                    if deadline is not None and time.time() >= deadline:
+                        break
+        finally:
+            jel.close()
+        return True
+
+    def get_exit_code(self):
+        """Non-zero if waiting for the submitted job did not complete"""
+        return 0 if self.wait_complete else 1
+
     def build_arguments(self, job):
-        # Build argument string
+        """Builds the list of command line arguments for each batch process"""
         ARGS_TO_COPY = [
             "db",
             "dbpath",
@@ -139,24 +255,26 @@ class Condor(Executor):
 
         # Move the RUNTESTS_DB environment variable to a dbconfig file because
         # it contains password, globally readable from condor
-        if 'RUNTESTS_DB' in os.environ:
+        connstr = os.environ.pop('RUNTESTS_DB', None)
+        if connstr is not None:
             if not self.other_args['dbpath']:
                 self.other_args['dbpath'] = '.pgconfig.tmp'
 
                 with open('.pgconfig.tmp', 'w') as f:
                     os.fchmod(f.fileno(), stat.S_IRUSR | stat.S_IWUSR)
-                    f.write(os.environ['RUNTESTS_DB'])
+                    f.write(connstr)
 
-            del os.environ['RUNTESTS_DB']
+        # Equivalent to arg_parser.get_default, without a scan of the parser's
+        # actions for every argument
+        defaults = dict((action.dest, action.default)
+                        for action in self.arg_parser._actions)
 
         arguments = []
-        for (arg, val) in self.other_args.iteritems():
-            if (arg in ARGS_TO_COPY) and (val is not self.arg_parser.get_default(arg)):
+        for (arg, val) in self.other_args.items():
+            if (arg in ARGS_TO_COPY) and (val is not defaults.get(arg)):
                 arguments.append("--%s" % arg)
                 if not isinstance(val, bool):
-                    # Condor is picky about quote types
-                    v = str(val).replace("'", "''")
-                    arguments.append("'%s'" % v)
+                    arguments.append(str(val))
 
         # Executor to use for batches
         arguments.append("-x")
@@ -166,16 +284,25 @@ class Condor(Executor):
         arguments.append("--batch")
         arguments.append("%s,$(Process)" % job._dbid)
 
-        return ' '.join(arguments)
+        return arguments
+
+    @staticmethod
+    def quote_arguments(arguments):
+        """Quotes a list of arguments using the Condor "new" arguments syntax:
+        the whole string is double quoted and each argument single quoted,
+        with embedded quotes of either kind escaped by doubling"""
+        return '"%s"' % ' '.join(
+            "'%s'" % a.replace("'", "''").replace('"', '""') for a in arguments)
 
     def write_jobinfo(self, job):
         jobinfo = {'JOB_ID': job._dbid, 'CONDOR_ID': job.condor_cluster}
         if self.log_job:
-            jobinfo['CONDOR_LOG'] = (self.LOG_JOB_FILE % job._dbid) \
-                .replace('$(Cluster)', job.condor_cluster)
+            jobinfo['CONDOR_LOG'] = self.get_job_log(job.condor_cluster)
 
         with open('condor.jobinfo', 'w') as f:
-            for item in jobinfo.iteritems():
+            # One write per line; don't use writelines on a single string,
+            # which writes it a character at a time
+            for item in jobinfo.items():
                 f.write("export RUNTESTS_%s=%s\n" % item)
 
     @staticmethod
@@ -203,6 +330,20 @@ class Condor(Executor):
             "--condor_log_all", action="store_true",
             help='Produce a logfile for each Condor test run')
 
+        condor_args.add_argument(
+            "--condor_wait", action="store_true",
+            help='Wait for the submitted Condor job to complete before exiting, '
+            'by following its logfile (implies --condor_log). Exits non-zero '
+            'if the wait times out. Held processes are not released, they and '
+            'any other unfinished processes are left queued on timeout (see '
+            'condor_q -hold, condor_release and condor_rm)')
+
+        condor_args.add_argument(
+            "--condor_wait_timeout", action="store", metavar="minutes",
+            type=int, default=Condor.wait_timeout,
+            help='Time to wait for the Condor job with --condor_wait, defaults '
+            'to 40 minutes, set to 0 for no timeout')
+
         condor_args.add_argument(
             "--condor_help", action="store_true", help="Help on Condor setup")
 
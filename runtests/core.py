@@ -21,7 +21,12 @@ class TestCase(Timer, DBObject):
     way.
     """
     _table = "test_runs"
-    batch = None
+
+    # One instance is created per test file found, so avoid a __dict__ each
+    __slots__ = ("batch", "filename", "realpath", "test_record_loaded",
+                 "negative", "nostrict", "onlystrict", "includes",
+                 "interp_result", "result", "exit_code", "stdout", "stderr",
+                 "start_time", "stop_time", "_dbid")
 
     # Fake-enum for result
     UNKNOWN = 0
@@ -31,23 +36,29 @@ class TestCase(Timer, DBObject):
     TIMEOUT = 4
     RESULT_TEXT = ["UNKNOWN", "PASS", "FAIL", "ABORT", "TIMEOUT"]
 
-    filename = ""
-    test_record_loaded = False
-    negative = False   # Whether the testcase is expected to fail
-    nostrict = False
-    onlystrict = False
-    includes = None    # List of required JS helper files for test to run
+    def __init__(self, filename, lazy=False, realpath=None):
+        """realpath may be given if already known, to save resolving it"""
+        self.batch = None
+        self.filename = filename
+        self.realpath = realpath or os.path.realpath(filename)
+
+        self.test_record_loaded = False
+        self.negative = False   # Whether the testcase is expected to fail
+        self.nostrict = False
+        self.onlystrict = False
+        self.includes = None    # List of required JS helper files for test to run
 
-    # Test results
-    result = UNKNOWN   # Derived from exit_code by an interpreter class
-    exit_code = -1     # UNIX exit code
-    stdout = ""
-    stderr = ""
+        # Test results
+        self.interp_result = None
+        self.result = TestCase.UNKNOWN  # Derived from exit_code by an interpreter class
+        self.exit_code = -1     # UNIX exit code
+        self.stdout = ""
+        self.stderr = ""
 
+        # Slots shadow the class defaults of Timer and DBObject
+        self.start_time = self.stop_time = datetime.min
+        self._dbid = 0
 
-    def __init__(self, filename, lazy=False):
-        self.filename = filename
-        self.realpath = os.path.realpath(filename)
         if not lazy:
             self.fetch_file_info()
 
@@ -243,9 +254,9 @@ class TestBatch(Timer, DBObject):
                 "numpasses": len(self.passed_tests),
                 "numfails": len(self.failed_tests),
                 "numaborts": len(self.aborted_tests),
-                "aborts": map(lambda x: x.report_dict(), self.aborted_tests),
-                "failures": map(lambda x: x.report_dict(), self.failed_tests),
-                "passes": map(lambda x: x.report_dict(), self.passed_tests)}
+                "aborts": [x.report_dict() for x in self.aborted_tests],
+                "failures": [x.report_dict() for x in self.failed_tests],
+                "passes": [x.report_dict() for x in self.passed_tests]}
 
     def add_job_id(self, d):
         if self.job is not None:
@@ -4,7 +4,16 @@ import sqlite3
 try:
     import psycopg2
 except ImportError:
-    psycopg2 = None
+    try:
+        # Pure Python implementation, for PyPy
+        from psycopg2cffi import compat
+        compat.register()
+        import psycopg2
+    except ImportError:
+        psycopg2 = None
+
+if psycopg2:
+    import psycopg2.extras
 
 from .resulthandler import TestResultHandler
 
@@ -12,6 +21,11 @@ class DBManager(TestResultHandler):
     conn = None
     cur = None
     wait_for_batch = False
+    running_batch = None
+
+    # Number of rows sent to the database server per round-trip for bulk
+    # statements
+    bulk_page_size = 1000
 
     def __del__(self):
         self.disconnect()
@@ -26,8 +40,9 @@ class DBManager(TestResultHandler):
 
     def insert_testcases(self, testcases):
         """Bulk inserts testcase data and commits"""
-        tcds = map(lambda t: t.db_tc_dict(), testcases)
-        self.insert_ignore_many("test_cases", tcds)
+        tcds = [t.db_tc_dict() for t in testcases]
+        if tcds:
+            self.insert_ignore_many("test_cases", tcds)
 
     def create_job_batches_runs(self, job):
         self.insert_object(job)
@@ -41,6 +56,7 @@ class DBManager(TestResultHandler):
         self.conn.commit()
 
     def start_batch(self, batch):
+        self.running_batch = batch
         self.connect()
         self.update_object(batch)
         self.conn.commit()
@@ -62,6 +78,19 @@ class DBManager(TestResultHandler):
         self.update_object(batch)
         self.conn.commit()
         self.disconnect()
+        self.running_batch = None
+
+    def interrupt_handler(self):
+        """Saves the tests finished so far in the running batch, when waiting
+        for the batch they would otherwise only be written by finish_batch"""
+        if not self.wait_for_batch or self.running_batch is None:
+            return
+        finished = self.running_batch.get_finished_testcases()
+        if finished:
+            self.connect()
+            self.update_objects(finished)
+            self.conn.commit()
+            self.disconnect()
 
     # Helper functions
     def build_fields_insert(self, fields):
@@ -69,9 +98,9 @@ class DBManager(TestResultHandler):
         Builds a field list pattern to substitute into a SQL statement, eg:
         ["a","b","c"] ==> [ "a, b, c", ":a, :b, :c" ]
         """
-        key_pairs = map(lambda k: (k, self.subst_pattern(k)), fields)
+        key_pairs = [(k, self.subst_pattern(k)) for k in fields]
         key_lists = zip(*key_pairs)
-        key_strings = map(", ".join, key_lists)
+        key_strings = [", ".join(l) for l in key_lists]
         return key_strings
 
     def build_fields_update(self, fields):
@@ -79,7 +108,7 @@ class DBManager(TestResultHandler):
         Builds a field list pattern to substitute into a SQL statement, eg:
         ["a","b","c"] ==> [ "a = :a, b = :b, c = :c" ]
         """
-        assigns = map(lambda k: "%s = %s" % (k, self.subst_pattern(k)), fields)
+        assigns = ["%s = %s" % (k, self.subst_pattern(k)) for k in fields]
         return ", ".join(assigns)
 
     def insert(self, table, dic):
@@ -122,7 +151,7 @@ class DBManager(TestResultHandler):
     def update_objects(self, objs):
         """Assumes all objects passed in are of same class"""
         table = objs[0]._table
-        dicts = map(lambda o: o.db_dict(), objs)
+        dicts = [o.db_dict() for o in objs]
         self.update_many(table, dicts)
 
     def load_batch_tests(self, job_id, batch_idx):
@@ -164,7 +193,7 @@ class DBManager(TestResultHandler):
                     with open(".pgconfig", "r") as f:
                         connstr = f.readline()
 
-            dbmanager = PostgresDBManager(connstr, args.db_pg_schema)
+                dbmanager = PostgresDBManager(connstr, args.db_pg_schema)
 
             if args.db_init:
                 dbmanager.connect()
@@ -172,7 +201,7 @@ class DBManager(TestResultHandler):
                 print("Database created successfully")
                 exit(0)
 
-            if args.executor is 'condor':
+            if args.executor == 'condor':
                 dbmanager.wait_for_batch = True
             dbmanager.connect()
 
@@ -253,7 +282,9 @@ class PostgresDBManager(DBManager):
                (table, fnames, fsubst, table, self.subst_pattern("id")))
 
         self.cur.execute("LOCK TABLE %s IN SHARE ROW EXCLUSIVE MODE" % table)
-        self.cur.executemany(sql, coll)
+        # executemany makes a server round-trip per row, batch them instead
+        psycopg2.extras.execute_batch(self.cur, sql, coll,
+                                      page_size=self.bulk_page_size)
         self.conn.commit()
 
     def prepare_schema(self, sql):
@@ -268,6 +299,8 @@ class PostgresDBManager(DBManager):
 
 
 class DBObject(object):
+    __slots__ = ()
+
     _table = ""
     _dbid = 0
 
@@ -57,7 +57,7 @@ class Interpreter(SubclassSelectorMixin):
             try:
                 output = subprocess.check_output([self.path, "--version"],
                             stderr=subprocess.DEVNULL)
-                return output.strip()
+                return output.strip().decode('utf-8', 'replace')
             except:
                 return "Unknown version"
         else:
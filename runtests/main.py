@@ -10,7 +10,13 @@ import logging
 import os
 import signal
 import sys
-from functools import reduce
+from itertools import islice
+
+try:
+    from os import scandir
+except ImportError:
+    # Python < 3.5
+    from scandir import scandir
 
 from .core import Job, TestCase
 from .db import DBManager
@@ -27,36 +33,71 @@ class Runtests(object):
     """Main class"""
 
     db = None
+    executor = None
 
     interrupted = False
 
-    def get_testcases_from_paths(self, paths, testcases=[], exclude=[]):
-        return reduce(
-            lambda ts, p: self.get_testcases_from_path(p, ts, exclude),
-            paths, [])
+    def __init__(self):
+        # What to do if the user hits control-C, or Condor stops the job
+        signal.signal(signal.SIGINT, self.interrupt_handler)
+        signal.signal(signal.SIGTERM, self.interrupt_handler)
+
+    def iter_testcases_from_paths(self, paths, exclude=frozenset()):
+        """Generates test cases from each of the paths in turn, exclude is a set
+        of file paths to skip"""
+        for path in paths:
+            for testcase in self.iter_testcases_from_path(path, exclude):
+                yield testcase
 
-    def get_testcases_from_path(self, path, testcases=[], exclude=[]):
+    def iter_testcases_from_path(self, path, exclude=frozenset()):
         if not os.path.exists(path):
             raise IOError("No such file or directory: %s" % path)
 
         if os.path.isdir(path):
-            return self.get_testcases_from_dir(path, testcases, exclude)
+            for testcase in self.iter_testcases_from_dir(path, exclude):
+                yield testcase
         elif path not in exclude:
-            testcases.append(TestCase(path))
-
-        return testcases
+            yield TestCase(path)
 
-    def get_testcases_from_dir(self, dirname, testcases=[], exclude=[]):
+    def iter_testcases_from_dir(self, dirname, exclude=frozenset()):
         """ Recusively walk the given directory looking for .js files, does not
-            traverse symbolic links"""
-        for r, d, f in os.walk(dirname):
-            for filename in f:
-                filename = os.path.join(r, filename)
-                if (os.path.isfile(filename)
-                        and filename.endswith(".js")
-                        and filename not in exclude):
-                    testcases.append(TestCase(filename))
-        return testcases
+            traverse symbolic links. exclude is a set of file paths to skip"""
+        # scandir entries carry the file type from the directory listing, so
+        # no further stat is needed for anything but symbolic links.
+        # Likewise, the real path is resolved once per directory, rather than
+        # with an lstat per path component for every test.
+        # As with os.walk, directories that cannot be listed are skipped, and
+        # each directory's files come before its subdirectories, in listing
+        # order.
+        dirs = [dirname]
+        while dirs:
+            path = dirs.pop()
+            realdir = os.path.realpath(path)
+            try:
+                it = scandir(path)
+            except OSError:
+                continue
+
+            subdirs = []
+            with it:
+                while True:
+                    try:
+                        entry = next(it)
+                    except StopIteration:
+                        break
+                    except OSError:
+                        break
+
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif (entry.name.endswith(".js")
+                            and entry.is_file()
+                            and entry.path not in exclude):
+                        realpath = None if entry.is_symlink() \
+                            else os.path.join(realdir, entry.name)
+                        yield TestCase(entry.path, realpath=realpath)
+
+            dirs.extend(reversed(subdirs))
 
     def interrupt_handler(self, signal, frame):
         if self.interrupted:
@@ -65,7 +106,8 @@ class Runtests(object):
 
         logging.warning("Interrupted... Running pending output actions")
         self.interrupted = True
-        self.executor.stop()
+        if self.executor:
+            self.executor.stop()
 
         exit(2)
 
@@ -109,7 +151,7 @@ filename using the @ character.
             help="Files in test tree to exlude from testing")
 
         argp.add_argument(
-            "--verbose", '-v', action="count",
+            "--verbose", '-v', action="count", default=0,
             help="Print the output of the tests as they happen. Pass multiple "
             "times for more verbose output.")
 
@@ -205,10 +247,14 @@ filename using the @ character.
         return argp
 
     def main(self):
+        self.interrupted = False
+
         # Parse arguments
         argp = self.build_arg_parser()
         args = argp.parse_args()
         args.arg_parser = argp
+        # Tested against every file found, so make membership checks O(1)
+        args.exclude = frozenset(args.exclude)
 
         # Configure logging
         log_level = logging.DEBUG if args.verbose > 1 else logging.INFO
@@ -232,9 +278,6 @@ filename using the @ character.
                 logging.getLogger().addHandler(file_log)
 
         try:
-            # What to do if the user hits control-C
-            signal.signal(signal.SIGINT, self.interrupt_handler)
-
             self.executor = executor = Executor.Construct(args.executor, args)
 
             dbmanager = DBManager.from_args(args)
@@ -277,18 +320,32 @@ filename using the @ character.
                     tc._dbid = dbid
                     testcases.append(tc)
 
+                job.add_testcases(testcases)
+                n_tests = len(testcases)
+
             else:
-                testcases = self.get_testcases_from_paths(
+                if dbmanager:
+                    logging.info("Preloading test-cases into database...")
+
+                # Preload test cases in chunks as they are found, rather than
+                # waiting for the whole tree to be walked first
+                testcases = self.iter_testcases_from_paths(
                     args.filenames, exclude=args.exclude)
+                n_tests = 0
+                while True:
+                    chunk = list(islice(testcases, DBManager.bulk_page_size))
+                    if not chunk:
+                        break
+                    if dbmanager:
+                        dbmanager.insert_testcases(chunk)  # auto-commits
+                    job.add_testcases(chunk)
+                    n_tests += len(chunk)
 
                 if dbmanager:
-                    logging.info("Preloading test-cases into database...")
-                    dbmanager.insert_testcases(testcases)  # auto-commits
                     logging.info("Done preloading test-cases")
 
-            job.add_testcases(testcases)
             logging.info("%s tests found, split into %s test batches.",
-                        len(testcases), len(job.batches))
+                        n_tests, len(job.batches))
 
             if dbmanager and not args.batch:
                 logging.info("Inserting job into database")
@@ -297,6 +354,9 @@ filename using the @ character.
 
             executor.run_job(job)
 
+            if isinstance(executor, Condor):
+                # Tests run later, on the cluster
+                exit(executor.get_exit_code())
             exit(cli.get_exit_code())
 
         except Exception as e:
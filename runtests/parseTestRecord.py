@@ -16,7 +16,6 @@ import subprocess
 import sys
 import tempfile
 import time
-import imp
 
 # from TestCasePackagerConfig import *
 
@@ -81,7 +80,7 @@ def yamlAttrParser(testRecord, attrs, name):
     parsed = yamlLoad(body)
 
     if (parsed is None):
-        print "Failed to parse yaml in name %s"%(name)
+        print("Failed to parse yaml in name %s"%(name))
         return
 
     for key in parsed:
@@ -117,14 +116,8 @@ def importYamlLoad():
     yamlLoad = monkeyYaml.load
 
 def loadMonkeyYaml():
-    f = None
     try:
-        p = os.path.dirname(os.path.realpath(__file__))
-        (f, pathname, description) = imp.find_module("monkeyYaml", [p])
-        module = imp.load_module("monkeyYaml", f, pathname, description)
-        return module
+        from . import monkeyYaml
+        return monkeyYaml
     except:
         raise ImportError("Cannot load monkeyYaml")
-    finally:
-        if f:
-            f.close()
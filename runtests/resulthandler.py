@@ -2,12 +2,18 @@ from __future__ import print_function
 import getpass
 import os
 import time
-import urllib
+
+try:
+    from urllib.parse import quote
+except ImportError:
+    # Python 2
+    from urllib import quote
 
 try:
     import pystache
-except ImportError as e:
+except ImportError as ex:
     pystache = None
+    PYSTACHE_IMPORT_ERROR = ex
 
 
 class TestResultHandler(object):
@@ -129,7 +135,8 @@ class WebResultPrinter(TestResultHandler):
     def __init__(self, templatedir, reportdir, noindex):
         if not pystache:
             raise ImportError(
-                "%s: pystache is required for web reports" % e.message)
+                "%s: pystache is required for web reports" %
+                (PYSTACHE_IMPORT_ERROR,))
 
         self.noindex = noindex
         self.set_paths(templatedir, reportdir)
@@ -180,11 +187,11 @@ class WebResultPrinter(TestResultHandler):
 
     def index_reports(self):
         # Get a list of all non-index html files in the reportdir
-        filenames = filter(lambda x: x != "index.html", filter(
-            lambda x: x.endswith(".html"), os.listdir(self.reportdir)))
-        filenames.sort()
-        filenames = map(lambda x: {"linkname": os.path.basename(
-            x), "filename": urllib.quote(os.path.basename(x))}, filenames)
+        filenames = sorted(x for x in os.listdir(self.reportdir)
+                           if x.endswith(".html") and x != "index.html")
+        filenames = [{"linkname": os.path.basename(x),
+                      "filename": quote(os.path.basename(x))}
+                     for x in filenames]
         simplerenderer = pystache.Renderer(escape=lambda u: u)
         with open(os.path.join(self.templatedir, "template.tmpl"), "r") as outer:
             with open(os.path.join(self.templatedir, "index.tmpl"), "r") as template:
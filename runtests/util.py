@@ -10,6 +10,8 @@ else:
 
 
 class Timer(object):
+    __slots__ = ()
+
     start_time = datetime.min
     stop_time = datetime.min
 
@@ -88,6 +90,6 @@ def get_git_version(dir=None):
     hash = ''
     try:
         out = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=dir)
-        hash = out.strip()
+        hash = out.strip().decode('utf-8')
     finally:
         return hash